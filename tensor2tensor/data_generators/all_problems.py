@@ -100,6 +100,16 @@ MODULES = [
 ]
 ALL_MODULES = list(MODULES)
 
+# Modules that define command-line flags when imported. Flags must be defined
+# before argv is parsed, so tensor2tensor.problems imports these right away
+# instead of on the first registry lookup.
+FLAG_MODULES = [
+    "tensor2tensor.data_generators.audio",
+    "tensor2tensor.data_generators.video_utils",
+    "tensor2tensor.data_generators.wiki_revision",
+    "tensor2tensor.data_generators.wsj_parsing",
+]
+
 
 
 def _is_import_err_msg(err_str, module):
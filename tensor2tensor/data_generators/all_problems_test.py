@@ -0,0 +1,49 @@
+# coding=utf-8
+# Copyright 2019 The Tensor2Tensor Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for all_problems."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import io
+import os
+
+from six.moves import range  # pylint: disable=redefined-builtin
+
+from tensor2tensor.data_generators import all_problems
+
+import tensorflow as tf
+
+
+class AllProblemsTest(tf.test.TestCase):
+
+  def testFlagModulesCoverProblemModulesDefiningFlags(self):
+    # The repository root, three levels above all_problems.py.
+    root = os.path.abspath(all_problems.__file__)
+    for _ in range(3):
+      root = os.path.dirname(root)
+    for module in all_problems.ALL_MODULES:
+      filepath = os.path.join(root, *module.split(".")) + ".py"
+      if not os.path.exists(filepath):
+        continue
+      with io.open(filepath, encoding="utf-8") as f:
+        if "DEFINE_" in f.read():
+          self.assertIn(module, all_problems.FLAG_MODULES)
+
+
+if __name__ == "__main__":
+  tf.test.main()
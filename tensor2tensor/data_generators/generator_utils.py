@@ -21,6 +21,7 @@ from __future__ import print_function
 
 import gzip
 import math
+from multiprocessing.pool import ThreadPool
 import os
 import random
 import stat
@@ -248,6 +249,133 @@ def maybe_download(directory, filename, uri):
   return filepath
 
 
+# Seconds to wait for a download server to connect or send data.
+_DOWNLOAD_TIMEOUT = 60
+# Ask for the stored bytes, so that lengths and byte ranges refer to the file.
+_IDENTITY_ENCODING = {"Accept-Encoding": "identity"}
+
+
+def _download_ranges(uri, filepath, size, num_streams):
+  """Fetches uri into filepath with num_streams concurrent range requests.
+
+  Each range is written at its offset, which tf.gfile files do not support.
+  When filepath is not local, the ranges are downloaded into a local temporary
+  file that is copied to filepath with tf.gfile once complete.
+
+  Args:
+    uri: HTTP URL of a file of size bytes that accepts byte-range requests.
+    filepath: path to download to, local or any path tf.gfile can write.
+    size: the size of the file in bytes.
+    num_streams: number of concurrent range requests.
+
+  Raises:
+    ValueError: if a range request fails or does not return exactly the bytes
+      of its range. The partial download is removed.
+  """
+  tf.logging.info("Downloading %s to %s with %d streams" %
+                  (uri, filepath, num_streams))
+  inprogress_filepath = filepath + ".incomplete"
+  if "://" in filepath:
+    fd, local_filepath = tempfile.mkstemp()
+    os.close(fd)
+  else:
+    local_filepath = inprogress_filepath
+  with open(local_filepath, "wb") as f:
+    f.truncate(size)
+  range_size = int(math.ceil(size / num_streams))
+  byte_ranges = [(start, min(start + range_size, size) - 1)
+                 for start in range(0, size, range_size)]
+
+  def download_range(byte_range):
+    """Writes the bytes of byte_range at their offset in the download."""
+    start, end = byte_range
+    headers = dict(_IDENTITY_ENCODING, Range="bytes=%d-%d" % (start, end))
+    response = requests.get(
+        uri, headers=headers, stream=True, timeout=_DOWNLOAD_TIMEOUT)
+    try:
+      if response.status_code != 206:
+        raise ValueError("Range request for %s failed with status %d" %
+                         (uri, response.status_code))
+      content_range = response.headers.get("Content-Range")
+      expected_content_range = "bytes %d-%d/%d" % (start, end, size)
+      if content_range != expected_content_range:
+        raise ValueError("Range request for %s returned Content-Range %s, "
+                         "expected %s" %
+                         (uri, content_range, expected_content_range))
+      num_bytes = 0
+      with open(local_filepath, "r+b") as f:
+        f.seek(start)
+        for chunk in iter(lambda: response.raw.read(1 << 20), b""):
+          f.write(chunk)
+          num_bytes += len(chunk)
+    finally:
+      response.close()
+    if num_bytes != end - start + 1:
+      raise ValueError("Range request for %s returned %d bytes, expected %d" %
+                       (uri, num_bytes, end - start + 1))
+
+  pool = ThreadPool(len(byte_ranges))
+  succeeded = False
+  try:
+    pool.map(download_range, byte_ranges)
+    if local_filepath != inprogress_filepath:
+      tf.gfile.Copy(local_filepath, inprogress_filepath, overwrite=True)
+    succeeded = True
+  finally:
+    pool.close()
+    pool.join()
+    if local_filepath != inprogress_filepath:
+      tf.gfile.Remove(local_filepath)
+    if not succeeded and tf.gfile.Exists(inprogress_filepath):
+      tf.gfile.Remove(inprogress_filepath)
+  tf.gfile.Rename(inprogress_filepath, filepath)
+  tf.logging.info("Successfully downloaded %s, %s bytes." % (filepath, size))
+
+
+def maybe_download_parallel(directory, filename, uri, num_streams=8):
+  """Download filename from uri with concurrent HTTP range requests.
+
+  Splits the file into num_streams contiguous byte ranges that are fetched in
+  parallel and written in place, which helps when a single connection is
+  throughput limited. Falls back to maybe_download if uri is not an HTTP URL,
+  if the HEAD request fails, or if the server does not advertise byte-range
+  support and a content length.
+
+  Args:
+    directory: path to the directory that will be used.
+    filename: name of the file to download to (do nothing if it already exists).
+    uri: URI to download from.
+    num_streams: number of concurrent range requests.
+
+  Returns:
+    The path to the downloaded file.
+  """
+  tf.gfile.MakeDirs(directory)
+  filepath = os.path.join(directory, filename)
+  if tf.gfile.Exists(filepath):
+    tf.logging.info("Not downloading, file already found: %s" % filepath)
+    return filepath
+
+  size = 0
+  if uri.startswith("http"):
+    try:
+      head = requests.head(uri, allow_redirects=True,
+                           headers=_IDENTITY_ENCODING,
+                           timeout=_DOWNLOAD_TIMEOUT)
+      head.raise_for_status()
+      if head.headers.get("Accept-Ranges") == "bytes":
+        size = int(head.headers.get("Content-Length", 0))
+    except (requests.exceptions.RequestException, ValueError) as e:
+      tf.logging.info("HEAD request for %s failed, downloading with a single "
+                      "stream: %s" % (uri, e))
+      size = 0
+  if size:
+    _download_ranges(uri, filepath, size, num_streams)
+  else:
+    maybe_download(directory, filename, uri)
+  return filepath
+
+
 def maybe_download_from_drive(directory, filename, url):
   """Download filename from Google drive unless it's already in directory.
 
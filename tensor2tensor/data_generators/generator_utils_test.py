@@ -23,13 +23,61 @@ import gzip
 import io
 import os
 import tempfile
+import threading
 from builtins import bytes  # pylint: disable=redefined-builtin
+from six.moves import BaseHTTPServer
+from six.moves import socketserver
 
 from tensor2tensor.data_generators import generator_utils
 
 import tensorflow as tf
 
 
+class _RangeServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+  daemon_threads = True
+
+
+class _RangeRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+  """Serves server.content, honouring single byte-range requests.
+
+  If server.truncate_ranges is set, range responses only contain the first
+  half of the requested bytes. If server.refuse_head is set, HEAD requests
+  fail with 405.
+  """
+
+  def do_HEAD(self):  # pylint: disable=invalid-name
+    if self.server.refuse_head:
+      self.send_error(405)
+      return
+    self._respond(send_body=False)
+
+  def do_GET(self):  # pylint: disable=invalid-name
+    self._respond(send_body=True)
+
+  def _respond(self, send_body):
+    content = self.server.content
+    range_header = self.headers.get("Range")
+    if range_header:
+      start, end = [int(x) for x in range_header.split("=")[1].split("-")]
+      body = content[start:end + 1]
+      if self.server.truncate_ranges:
+        body = body[:len(body) // 2]
+      self.send_response(206)
+      self.send_header("Content-Range",
+                       "bytes %d-%d/%d" % (start, end, len(content)))
+    else:
+      body = content
+      self.send_response(200)
+    self.send_header("Accept-Ranges", "bytes")
+    self.send_header("Content-Length", str(len(body)))
+    self.end_headers()
+    if send_body:
+      self.wfile.write(body)
+
+  def log_message(self, *args):
+    pass
+
+
 class GeneratorUtilsTest(tf.test.TestCase):
 
   def testGenerateFiles(self):
@@ -63,6 +111,58 @@ class GeneratorUtilsTest(tf.test.TestCase):
     os.remove(tmp_file_path + ".http")
     os.remove(tmp_file_path)
 
+  def _serve_ranges(self, content, truncate_ranges=False, refuse_head=False):
+    """Serves content on localhost and returns its URL."""
+    server = _RangeServer(("127.0.0.1", 0), _RangeRequestHandler)
+    server.content = content
+    server.truncate_ranges = truncate_ranges
+    server.refuse_head = refuse_head
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    self.addCleanup(server.server_close)
+    self.addCleanup(server.shutdown)
+    return "http://127.0.0.1:%d/file" % server.server_address[1]
+
+  def testMaybeDownloadParallel(self):
+    tmp_dir = self.get_temp_dir()
+    content = os.urandom(100003)
+    uri = self._serve_ranges(content)
+
+    res_path = generator_utils.maybe_download_parallel(
+        tmp_dir, "ranges.bin", uri, num_streams=4)
+    self.assertEqual(res_path, os.path.join(tmp_dir, "ranges.bin"))
+    self.assertFalse(tf.gfile.Exists(res_path + ".incomplete"))
+    with io.open(res_path, "rb") as f:
+      self.assertEqual(f.read(), content)
+
+    # Clean up.
+    os.remove(res_path)
+
+  def testMaybeDownloadParallelWithoutHead(self):
+    tmp_dir = self.get_temp_dir()
+    content = os.urandom(1003)
+    uri = self._serve_ranges(content, refuse_head=True)
+
+    res_path = generator_utils.maybe_download_parallel(
+        tmp_dir, "no_head.bin", uri, num_streams=4)
+    with io.open(res_path, "rb") as f:
+      self.assertEqual(f.read(), content)
+
+    # Clean up.
+    os.remove(res_path)
+
+  def testMaybeDownloadParallelTruncatedRange(self):
+    tmp_dir = self.get_temp_dir()
+    uri = self._serve_ranges(os.urandom(100003), truncate_ranges=True)
+
+    with self.assertRaises(ValueError):
+      generator_utils.maybe_download_parallel(
+          tmp_dir, "truncated.bin", uri, num_streams=4)
+    self.assertFalse(tf.gfile.Exists(os.path.join(tmp_dir, "truncated.bin")))
+    self.assertFalse(
+        tf.gfile.Exists(os.path.join(tmp_dir, "truncated.bin.incomplete")))
+
   def testMaybeDownloadFromDrive(self):
     tmp_dir = self.get_temp_dir()
     (_, tmp_file_path) = tempfile.mkstemp(dir=tmp_dir)
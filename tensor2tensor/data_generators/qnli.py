@@ -19,7 +19,11 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import io
+import itertools
+import mmap
 import os
+import struct
 import zipfile
 from tensor2tensor.data_generators import generator_utils
 from tensor2tensor.data_generators import problem
@@ -30,6 +34,99 @@ import tensorflow as tf
 
 EOS = text_encoder.EOS
 
+# Read the zip members in large chunks so that inflate runs over big windows.
+_READ_BUFFER_SIZE = 1 << 20
+# Header of a cached example: byte lengths of the two sentences and the label.
+_CACHE_RECORD = struct.Struct("<IIB")
+# Trailer of the cache: the number of records, after their offsets.
+_CACHE_COUNT = struct.Struct("<Q")
+
+
+def _example_cache_filepath(tmp_dir, filesplit, zip_filepath):
+  """Path of the example cache for a split of the zip at zip_filepath.
+
+  The name includes the size and modification time of the zip, so a changed or
+  re-downloaded archive gets a fresh cache instead of reusing a stale one.
+
+  Args:
+    tmp_dir: directory holding the zip and the caches.
+    filesplit: "train" or "dev".
+    zip_filepath: path to QNLI.zip.
+
+  Returns:
+    a string
+  """
+  stat = tf.gfile.Stat(zip_filepath)
+  return os.path.join(tmp_dir, "QNLI-%s-%d-%d.bin" %
+                      (filesplit, stat.length, stat.mtime_nsec))
+
+
+def _write_example_cache(examples, cache_filepath):
+  """Yields examples, saving them to cache_filepath once all were consumed.
+
+  The records are followed by an index of their offsets and the record count,
+  so that _read_example_cache can jump straight to the records of one shard.
+
+  Args:
+    examples: an iterable of dictionaries with "inputs" and "label".
+    cache_filepath: where to write the cache.
+
+  Yields:
+    the examples, unchanged.
+  """
+  buf = bytearray()
+  offsets = []
+  for example in examples:
+    s1, s2 = [s.encode("utf-8") for s in example["inputs"]]
+    offsets.append(len(buf))
+    buf += _CACHE_RECORD.pack(len(s1), len(s2), example["label"])
+    buf += s1
+    buf += s2
+    yield example
+  buf += struct.pack("<%dQ" % len(offsets), *offsets)
+  buf += _CACHE_COUNT.pack(len(offsets))
+  # Unique per process, since parallel generate_data tasks may race here.
+  inprogress_filepath = "%s.incomplete-%d" % (cache_filepath, os.getpid())
+  with tf.gfile.GFile(inprogress_filepath, "wb") as f:
+    f.write(bytes(buf))
+  tf.gfile.Rename(inprogress_filepath, cache_filepath, overwrite=True)
+
+
+def _read_example_cache(cache_filepath, shard=0, num_shards=1):
+  """Yields the examples saved by _write_example_cache from a memory map.
+
+  Args:
+    cache_filepath: a cache written by _write_example_cache.
+    shard: index of the first example to yield.
+    num_shards: yield every num_shards-th example from shard on.
+
+  Yields:
+    dictionaries with "inputs" and "label".
+  """
+  if not tf.gfile.Stat(cache_filepath).length:
+    return  # mmap cannot map an empty file.
+  # mmap needs a local file descriptor, which tf.gfile does not expose.
+  with open(cache_filepath, "rb") as f:
+    buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+  try:
+    count_offset = len(buf) - _CACHE_COUNT.size
+    count, = _CACHE_COUNT.unpack_from(buf, count_offset)
+    index = struct.Struct("<%dQ" % count)
+    offsets = index.unpack_from(buf, count_offset - index.size)
+    for i in range(shard, count, num_shards):
+      offset = offsets[i]
+      len1, len2, label = _CACHE_RECORD.unpack_from(buf, offset)
+      offset += _CACHE_RECORD.size
+      s1 = buf[offset:offset + len1].decode("utf-8")
+      offset += len1
+      s2 = buf[offset:offset + len2].decode("utf-8")
+      yield {
+          "inputs": [s1, s2],
+          "label": label
+      }
+  finally:
+    buf.close()
+
 
 @registry.register_problem
 class QuestionNLI(text_problems.TextConcat2ClassProblem):
@@ -41,6 +138,11 @@ class QuestionNLI(text_problems.TextConcat2ClassProblem):
                "data%2FQNLI.zip?alt=media&token=c24cad61-f2df-"
                "4f04-9ab6-aa576fa829d0")
 
+  def __init__(self, was_reversed=False, was_copy=False):
+    super(QuestionNLI, self).__init__(was_reversed, was_copy)
+    # Downloaded zip path per tmp_dir, so each split does not re-check it.
+    self._zip_filepaths = {}
+
   @property
   def is_generate_per_split(self):
     return True
@@ -69,41 +171,109 @@ class QuestionNLI(text_problems.TextConcat2ClassProblem):
     return ["not_entailment", "entailment"]
 
   def _maybe_download_corpora(self, tmp_dir):
-    qnli_filename = "QNLI.zip"
-    qnli_finalpath = os.path.join(tmp_dir, "QNLI")
-    if not tf.gfile.Exists(qnli_finalpath):
-      zip_filepath = generator_utils.maybe_download(
+    if tmp_dir not in self._zip_filepaths:
+      qnli_filename = "QNLI.zip"
+      self._zip_filepaths[tmp_dir] = generator_utils.maybe_download_parallel(
           tmp_dir, qnli_filename, self._QNLI_URL)
-      zip_ref = zipfile.ZipFile(zip_filepath, "r")
-      zip_ref.extractall(tmp_dir)
-      zip_ref.close()
-
-    return qnli_finalpath
-
-  def example_generator(self, filename):
-    label_list = self.class_labels(data_dir=None)
-    for idx, line in enumerate(tf.gfile.Open(filename, "rb")):
-      if idx == 0: continue  # skip header
-      line = text_encoder.to_unicode_utf8(line.strip())
-      _, s1, s2, l = line.split("\t")
-      inputs = [s1, s2]
-      l = label_list.index(l)
-      yield {
-          "inputs": inputs,
-          "label": l
-      }
+    return self._zip_filepaths[tmp_dir]
+
+  def example_generator(self, zip_filepath, member):
+    """Stream examples from a TSV member of the QNLI zip, without extracting."""
+    label_to_id = {
+        label: i for i, label in enumerate(self.class_labels(data_dir=None))}
+    with zipfile.ZipFile(zip_filepath, "r") as zip_ref:
+      with zip_ref.open(member, "r") as raw:
+        buffered = io.BufferedReader(raw, buffer_size=_READ_BUFFER_SIZE)
+        f = io.TextIOWrapper(buffered, encoding="utf-8", newline="")
+        next(f)  # skip header
+        # Split the lines by hand: the Python 2 csv module rejects unicode.
+        for line in f:
+          _, s1, s2, l = line.strip().split("\t")
+          yield {
+              "inputs": [s1, s2],
+              "label": label_to_id[l]
+          }
 
-  def generate_samples(self, data_dir, tmp_dir, dataset_split):
-    qnli_dir = self._maybe_download_corpora(tmp_dir)
+  def generate_samples(self, data_dir, tmp_dir, dataset_split, shard=0,
+                       num_shards=1):
+    """Yields every num_shards-th example of the split, starting at shard."""
     if dataset_split == problem.DatasetSplit.TRAIN:
-      filesplit = "train.tsv"
+      filesplit = "train"
     else:
-      filesplit = "dev.tsv"
+      filesplit = "dev"
 
-    filename = os.path.join(qnli_dir, filesplit)
-    for example in self.example_generator(filename):
+    # Parsed examples are cached next to the zip so that later runs skip
+    # decompressing and parsing the TSV.
+    zip_filepath = self._maybe_download_corpora(tmp_dir)
+    cache_filepath = _example_cache_filepath(tmp_dir, filesplit, zip_filepath)
+    if tf.gfile.Exists(cache_filepath):
+      examples = _read_example_cache(cache_filepath, shard, num_shards)
+    else:
+      member = "QNLI/%s.tsv" % filesplit
+      examples = itertools.islice(
+          _write_example_cache(
+              self.example_generator(zip_filepath, member), cache_filepath),
+          shard, None, num_shards)
+    for example in examples:
       yield example
 
+  def generate_encoded_samples(self, data_dir, tmp_dir, dataset_split,
+                               shard=0, num_shards=1):
+    generator = self.generate_samples(data_dir, tmp_dir, dataset_split,
+                                      shard, num_shards)
+    encoder = self.get_or_create_vocab(data_dir, tmp_dir)
+    return self.encode_samples(generator, encoder)
+
+  @property
+  def multiprocess_generate(self):
+    return True
+
+  @property
+  def num_generate_tasks(self):
+    return sum(split["shards"] for split in self.dataset_splits)
+
+  def prepare_to_generate(self, data_dir, tmp_dir):
+    """Build the vocab and the example caches shared by all tasks."""
+    self.get_or_create_vocab(data_dir, tmp_dir)
+    for split in self.dataset_splits:
+      for _ in self.generate_samples(data_dir, tmp_dir, split["split"]):
+        pass
+
+  def generate_data(self, data_dir, tmp_dir, task_id=-1):
+    """Generate all the shards, or only the shard of the given task.
+
+    Each task encodes every num_shards-th example of its split into a single
+    shard, reading only those examples from the cache that
+    prepare_to_generate filled, so the tasks can run in parallel processes.
+
+    Args:
+      data_dir: a string
+      tmp_dir: a string
+      task_id: an optional integer
+    """
+    if task_id is None or task_id < 0:
+      super(QuestionNLI, self).generate_data(data_dir, tmp_dir, task_id)
+      return
+
+    assert task_id < self.num_generate_tasks
+    filepath_fns = {
+        problem.DatasetSplit.TRAIN: self.training_filepaths,
+        problem.DatasetSplit.EVAL: self.dev_filepaths,
+    }
+    shard = task_id
+    for split in self.dataset_splits:
+      if shard < split["shards"]:
+        break
+      shard -= split["shards"]
+    num_shards = split["shards"]
+    out_file = filepath_fns[split["split"]](
+        data_dir, num_shards, shuffled=self.already_shuffled)[shard]
+    generator_utils.generate_files(
+        self.generate_encoded_samples(
+            data_dir, tmp_dir, split["split"], shard, num_shards),
+        [out_file])
+    generator_utils.shuffle_dataset([out_file], extra_fn=self._pack_fn())
+
 
 @registry.register_problem
 class QuestionNLICharacters(QuestionNLI):
@@ -0,0 +1,98 @@
+# coding=utf-8
+# Copyright 2019 The Tensor2Tensor Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for qnli."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import io
+import os
+import zipfile
+
+from tensor2tensor.data_generators import problem
+from tensor2tensor.data_generators import qnli
+
+import tensorflow as tf
+
+EXAMPLES = [
+    {"inputs": [u"Who wrote Faust?", u"Goethe wrote Faust."], "label": 1},
+    {"inputs": [u"Wo liegt Köln?", u"Köln liegt am Rhein — 日本語も."],
+     "label": 0},
+    {"inputs": [u"", u"An empty question."], "label": 1},
+]
+
+
+class QnliTest(tf.test.TestCase):
+
+  def testExampleCacheRoundTrip(self):
+    cache_filepath = os.path.join(self.get_temp_dir(), "round_trip.bin")
+    written = list(qnli._write_example_cache(iter(EXAMPLES), cache_filepath))
+    self.assertEqual(written, EXAMPLES)
+    self.assertEqual(list(qnli._read_example_cache(cache_filepath)), EXAMPLES)
+
+  def testShardedExampleCache(self):
+    cache_filepath = os.path.join(self.get_temp_dir(), "sharded.bin")
+    list(qnli._write_example_cache(iter(EXAMPLES), cache_filepath))
+    for shard in range(2):
+      self.assertEqual(
+          list(qnli._read_example_cache(cache_filepath, shard, 2)),
+          EXAMPLES[shard::2])
+
+  def testGenerateSamplesShard(self):
+    tmp_dir = self.get_temp_dir()
+    zip_filepath = os.path.join(tmp_dir, "QNLI.zip")
+    labels = ["not_entailment", "entailment"]
+    rows = ["index\tquestion\tsentence\tlabel"]
+    for i, example in enumerate(EXAMPLES):
+      rows.append("\t".join(
+          [str(i)] + example["inputs"] + [labels[example["label"]]]))
+    with zipfile.ZipFile(zip_filepath, "w") as zip_ref:
+      zip_ref.writestr("QNLI/train.tsv", "\n".join(rows).encode("utf-8"))
+    qnli_problem = qnli.QuestionNLI()
+    qnli_problem._zip_filepaths[tmp_dir] = zip_filepath
+    train = problem.DatasetSplit.TRAIN
+    # The first pass parses the zip and fills the cache, the second reads it.
+    for _ in range(2):
+      self.assertEqual(
+          list(qnli_problem.generate_samples(None, tmp_dir, train, 1, 2)),
+          EXAMPLES[1::2])
+
+  def testEmptyExampleCache(self):
+    cache_filepath = os.path.join(self.get_temp_dir(), "empty.bin")
+    self.assertEqual(list(qnli._write_example_cache(iter([]), cache_filepath)),
+                     [])
+    self.assertTrue(tf.gfile.Exists(cache_filepath))
+    self.assertEqual(list(qnli._read_example_cache(cache_filepath)), [])
+
+  def testExampleCacheFilepathFollowsZip(self):
+    tmp_dir = self.get_temp_dir()
+    zip_filepath = os.path.join(tmp_dir, "QNLI.zip")
+    with io.open(zip_filepath, "wb") as f:
+      f.write(b"first")
+    first = qnli._example_cache_filepath(tmp_dir, "train", zip_filepath)
+    self.assertEqual(
+        first, qnli._example_cache_filepath(tmp_dir, "train", zip_filepath))
+    self.assertNotEqual(
+        first, qnli._example_cache_filepath(tmp_dir, "dev", zip_filepath))
+    with io.open(zip_filepath, "wb") as f:
+      f.write(b"changed archive")
+    self.assertNotEqual(
+        first, qnli._example_cache_filepath(tmp_dir, "train", zip_filepath))
+
+
+if __name__ == "__main__":
+  tf.test.main()
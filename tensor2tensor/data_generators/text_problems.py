@@ -594,7 +594,11 @@ class TextConcat2ClassProblem(Text2ClassProblem):
   def generate_encoded_samples(self, data_dir, tmp_dir, dataset_split):
     generator = self.generate_samples(data_dir, tmp_dir, dataset_split)
     encoder = self.get_or_create_vocab(data_dir, tmp_dir)
-    for sample in generator:
+    return self.encode_samples(generator, encoder)
+
+  def encode_samples(self, samples, encoder):
+    """Encode samples, joining their inputs with CONCAT_TOKEN."""
+    for sample in samples:
       inputs = []
       for idx, inp in enumerate(sample["inputs"]):
         inputs += encoder.encode(inp)
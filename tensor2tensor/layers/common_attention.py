@@ -81,6 +81,55 @@ def maybe_upcast(logits,
   return logits
 
 
+# Largest number of elements in a position-dependent signal or bias that is
+# precomputed with NumPy and embedded in the graph as a constant. Larger ones
+# are computed with TensorFlow ops to keep the GraphDef small.
+_MAX_CONSTANT_SIZE = 1 << 22
+# Lower limit for constants that every layer embeds a copy of, such as the
+# relative positions matrix or block gather indices, so that deep models stay
+# within the GraphDef limit.
+_MAX_PER_LAYER_CONSTANT_SIZE = 1 << 16
+
+
+# Number of distinct argument tuples that each _cache_by_args function keeps.
+_CACHE_MAX_ENTRIES = 32
+
+
+def _cache_by_args(fn):
+  """Memoizes fn, which must only take hashable positional arguments.
+
+  Only the _CACHE_MAX_ENTRIES most recently used results are kept, so that
+  sweeping over many lengths does not hold on to every array it built.
+
+  Args:
+    fn: a function of hashable positional arguments.
+
+  Returns:
+    the memoized function.
+  """
+  cache = collections.OrderedDict()
+
+  @functools.wraps(fn)
+  def wrapper(*args):
+    if args in cache:
+      result = cache.pop(args)
+    else:
+      result = fn(*args)
+      if len(cache) >= _CACHE_MAX_ENTRIES:
+        cache.popitem(last=False)
+    cache[args] = result
+    return result
+
+  return wrapper
+
+
+def _is_static_size(*dims):
+  """Whether dims are Python ints with a product small enough for a constant."""
+  if not all(isinstance(d, int) for d in dims):
+    return False
+  return functools.reduce(operator.mul, dims, 1) <= _MAX_CONSTANT_SIZE
+
+
 # Struct containing the sequences ids and order on a batch (are send to the
 # expert to allow them to compute the bias mask)
 BatchInfo = collections.namedtuple("BatchInfo", "coordinates, order")
@@ -402,6 +451,50 @@ def encoder_decoder_attention_loss(expected_attention_logits,
   return loss * loss_multiplier
 
 
+@_cache_by_args
+def _get_sinusoids_numpy(length, num_timescales, min_timescale, max_timescale,
+                         start_index):
+  """NumPy sin/cos timing signal of shape [length, 2 * num_timescales]."""
+  position = np.arange(length, dtype=np.float64) + start_index
+  inv_timescales = _get_inv_timescales_numpy(num_timescales, min_timescale,
+                                             max_timescale)
+  scaled_time = np.outer(position, inv_timescales)
+  signal = np.concatenate([np.sin(scaled_time), np.cos(scaled_time)], axis=1)
+  return signal.astype(np.float32)
+
+
+def _get_inv_timescales_numpy(num_timescales, min_timescale, max_timescale):
+  """NumPy geometric sequence of inverse timescales, shape [num_timescales]."""
+  log_timescale_increment = (
+      math.log(float(max_timescale) / float(min_timescale)) /
+      max(num_timescales - 1, 1))
+  return min_timescale * np.exp(
+      np.arange(num_timescales, dtype=np.float64) * -log_timescale_increment)
+
+
+def _get_inv_timescales(num_timescales, min_timescale, max_timescale):
+  """Geometric sequence of inverse timescales as a float32 Tensor.
+
+  Args:
+    num_timescales: an integer or scalar Tensor.
+    min_timescale: a float
+    max_timescale: a float
+
+  Returns:
+    a Tensor with shape [num_timescales]. A constant if num_timescales is a
+    Python integer.
+  """
+  if isinstance(num_timescales, int):
+    return tf.constant(
+        _get_inv_timescales_numpy(num_timescales, min_timescale,
+                                  max_timescale).astype(np.float32))
+  log_timescale_increment = (
+      math.log(float(max_timescale) / float(min_timescale)) /
+      tf.maximum(tf.to_float(num_timescales) - 1, 1))
+  return min_timescale * tf.exp(
+      tf.to_float(tf.range(num_timescales)) * -log_timescale_increment)
+
+
 @expert_utils.add_name_scope()
 def get_timing_signal_1d(length,
                          channels,
@@ -438,13 +531,15 @@ def get_timing_signal_1d(length,
   Returns:
     a Tensor of timing signals [1, length, channels]
   """
+  if _is_static_size(length, channels) and isinstance(start_index, int):
+    signal = _get_sinusoids_numpy(length, channels // 2, min_timescale,
+                                  max_timescale, start_index)
+    signal = np.pad(signal, [[0, 0], [0, channels % 2]], "constant")
+    return tf.constant(signal.reshape([1, length, channels]))
   position = tf.to_float(tf.range(length) + start_index)
   num_timescales = channels // 2
-  log_timescale_increment = (
-      math.log(float(max_timescale) / float(min_timescale)) /
-      tf.maximum(tf.to_float(num_timescales) - 1, 1))
-  inv_timescales = min_timescale * tf.exp(
-      tf.to_float(tf.range(num_timescales)) * -log_timescale_increment)
+  inv_timescales = _get_inv_timescales(num_timescales, min_timescale,
+                                       max_timescale)
   scaled_time = tf.expand_dims(position, 1) * tf.expand_dims(inv_timescales, 0)
   signal = tf.concat([tf.sin(scaled_time), tf.cos(scaled_time)], axis=1)
   signal = tf.pad(signal, [[0, 0], [0, tf.mod(channels, 2)]])
@@ -485,8 +580,7 @@ def add_timing_signal_1d(x,
   Returns:
     a Tensor the same shape as x.
   """
-  length = common_layers.shape_list(x)[1]
-  channels = common_layers.shape_list(x)[2]
+  _, length, channels = common_layers.shape_list(x)
   signal = get_timing_signal_1d(length, channels, min_timescale, max_timescale,
                                 start_index)
   return x + common_layers.cast_like(signal, x)
@@ -592,11 +686,8 @@ def add_timing_signal_1d_given_position(x,
   """
   channels = common_layers.shape_list(x)[2]
   num_timescales = channels // 2
-  log_timescale_increment = (
-      math.log(float(max_timescale) / float(min_timescale)) /
-      (tf.to_float(num_timescales) - 1))
-  inv_timescales = min_timescale * tf.exp(
-      tf.to_float(tf.range(num_timescales)) * -log_timescale_increment)
+  inv_timescales = _get_inv_timescales(num_timescales, min_timescale,
+                                       max_timescale)
   scaled_time = (
       tf.expand_dims(tf.to_float(position), 2) * tf.expand_dims(
           tf.expand_dims(inv_timescales, 0), 0))
@@ -638,29 +729,39 @@ def add_timing_signal_nd(x, min_timescale=1.0, max_timescale=1.0e4):
   Returns:
     a Tensor the same shape as x.
   """
-  num_dims = len(x.get_shape().as_list()) - 2
-  channels = common_layers.shape_list(x)[-1]
+  x_shape = common_layers.shape_list(x)
+  num_dims = len(x_shape) - 2
+  channels = x_shape[-1]
   num_timescales = channels // (num_dims * 2)
-  log_timescale_increment = (
-      math.log(float(max_timescale) / float(min_timescale)) /
-      (tf.to_float(num_timescales) - 1))
-  inv_timescales = min_timescale * tf.exp(
-      tf.to_float(tf.range(num_timescales)) * -log_timescale_increment)
+  # Only needed, and only built once, for dimensions with a dynamic length.
+  inv_timescales = None
+  signals = []
   for dim in range(num_dims):
-    length = common_layers.shape_list(x)[dim + 1]
-    position = tf.to_float(tf.range(length))
-    scaled_time = tf.expand_dims(position, 1) * tf.expand_dims(
-        inv_timescales, 0)
-    signal = tf.concat([tf.sin(scaled_time), tf.cos(scaled_time)], axis=1)
+    length = x_shape[dim + 1]
     prepad = dim * 2 * num_timescales
     postpad = channels - (dim + 1) * 2 * num_timescales
-    signal = tf.pad(signal, [[0, 0], [prepad, postpad]])
+    if _is_static_size(length, channels):
+      signal = _get_sinusoids_numpy(length, num_timescales, min_timescale,
+                                    max_timescale, 0)
+      signal = tf.constant(
+          np.pad(signal, [[0, 0], [prepad, postpad]], "constant"))
+    else:
+      if inv_timescales is None:
+        inv_timescales = _get_inv_timescales(num_timescales, min_timescale,
+                                             max_timescale)
+      position = tf.to_float(tf.range(length))
+      scaled_time = tf.expand_dims(position, 1) * tf.expand_dims(
+          inv_timescales, 0)
+      signal = tf.concat([tf.sin(scaled_time), tf.cos(scaled_time)], axis=1)
+      signal = tf.pad(signal, [[0, 0], [prepad, postpad]])
     for _ in range(1 + dim):
       signal = tf.expand_dims(signal, 0)
     for _ in range(num_dims - 1 - dim):
       signal = tf.expand_dims(signal, -2)
-    x += signal
-  return x
+    signals.append(signal)
+  # Broadcast the per-dimension signals to [1, d1 ... dn, channels] first so
+  # that x, which also has the batch dimension, is only read once.
+  return x + functools.reduce(operator.add, signals)
 
 
 def add_positional_embedding(x, max_length, name=None, positions=None):
@@ -710,6 +811,7 @@ def add_positional_embedding_nd(x, max_length, name=None):
     base_shape = [1] * (num_dims + 1) + [depth]
     base_start = [0] * (num_dims + 2)
     base_size = [-1] + [1] * num_dims + [depth]
+    embeddings = []
     for i in range(num_dims):
       shape = base_shape[:]
       start = base_start[:]
@@ -720,9 +822,11 @@ def add_positional_embedding_nd(x, max_length, name=None):
           name + "_%d" % i,
           shape,
           initializer=tf.random_normal_initializer(0, depth**-0.5))
-      var = var * depth**0.5
-      x += tf.slice(var, start, size)
-    return x
+      embeddings.append(tf.slice(var, start, size))
+    # Sum the (batch-free) per-dimension embeddings first so that x, the
+    # largest tensor here, is only read and written once.
+    embedding = functools.reduce(operator.add, embeddings)
+    return x + embedding * depth**0.5
 
 
 def make_edge_vectors(adjacency_matrix, num_edge_types, depth, name=None):
@@ -852,8 +956,7 @@ def embedding_to_padding(emb):
     a float Tensor with shape [...]. Each element is 1 if its corresponding
     embedding vector is all zero, and is 0 otherwise.
   """
-  emb_sum = tf.reduce_sum(tf.abs(emb), axis=-1)
-  return tf.to_float(tf.equal(emb_sum, 0.0))
+  return tf.to_float(tf.reduce_all(tf.equal(emb, 0.0), axis=-1))
 
 
 @expert_utils.add_name_scope()
@@ -869,6 +972,42 @@ def padding_to_length(padding):
   return tf.to_int32(tf.reduce_sum(non_padding, axis=-1))
 
 
+@_cache_by_args
+def _attention_bias_band_numpy(rows, cols, max_backward, max_forward):
+  """NumPy version of _attention_bias_band for static arguments."""
+  band = common_layers.ones_matrix_band_part_numpy(rows, cols, max_backward,
+                                                   max_forward)
+  bias = -1e9 * (1.0 - band)
+  return bias.astype(np.float32)
+
+
+def _attention_bias_band(rows, cols, max_backward, max_forward, out_shape):
+  """Bias that is 0 inside a band of the [rows, cols] matrix and -1e9 outside.
+
+  The band is the one selected by common_layers.ones_matrix_band_part.
+
+  Args:
+    rows: int
+    cols: int
+    max_backward: int, maximum distance backward to attend. Negative values
+      indicate unlimited.
+    max_forward: int, maximum distance forward to attend. Negative values
+      indicate unlimited.
+    out_shape: shape to reshape the output to.
+
+  Returns:
+    a float32 `Tensor` with shape out_shape. A constant if all the other
+    arguments are Python integers.
+  """
+  if all(isinstance(el, int) for el in [rows, cols, max_backward, max_forward]):
+    return tf.constant(
+        _attention_bias_band_numpy(rows, cols, max_backward,
+                                   max_forward).reshape(out_shape))
+  band = common_layers.ones_matrix_band_part(
+      rows, cols, max_backward, max_forward, out_shape=out_shape)
+  return -1e9 * (1.0 - band)
+
+
 @expert_utils.add_name_scope()
 def attention_bias_local(length, max_backward, max_forward):
   """Create an bias tensor to be added to attention logits.
@@ -888,13 +1027,8 @@ def attention_bias_local(length, max_backward, max_forward):
   Returns:
     a `Tensor` with shape [1, 1, length, length].
   """
-  band = common_layers.ones_matrix_band_part(
-      length,
-      length,
-      max_backward,
-      max_forward,
-      out_shape=[1, 1, length, length])
-  return -1e9 * (1.0 - band)
+  return _attention_bias_band(length, length, max_backward, max_forward,
+                              [1, 1, length, length])
 
 
 @expert_utils.add_name_scope()
@@ -988,17 +1122,24 @@ def attention_bias_prepend_inputs_full_attention(padding):
   # This Tensor has zeros for the source portion and separator,
   # and ones for the target portion.
   in_target = tf.cumsum(padding, axis=1, exclusive=True)
-  # The position within the target, or 0 if part of the source.
-  target_pos = tf.cumsum(in_target, axis=1)
-  # A position with a lesser target_pos cannot see a position with greater
-  # target_pos.
-  illegal_connections = tf.greater(
-      tf.expand_dims(target_pos, 1), tf.expand_dims(target_pos, 2))
-  bias = tf.to_float(illegal_connections) * -1e9
-  bias = tf.expand_dims(bias, 1)
+  # A position cannot see a later position that is part of the target.
+  # in_target is non-decreasing along the sequence, so this is the same as
+  # comparing positions within the target.
+  length = common_layers.shape_list(padding)[1]
+  is_target = tf.to_float(tf.greater(in_target, 0.0))
+  bias = attention_bias_lower_triangle(length) * tf.expand_dims(
+      tf.expand_dims(is_target, 1), 1)
   return bias
 
 
+@_cache_by_args
+def _attention_bias_proximal_numpy(length):
+  """NumPy version of attention_bias_proximal for a static length."""
+  r = np.arange(length, dtype=np.float32)
+  diff = np.expand_dims(r, 0) - np.expand_dims(r, 1)
+  return -np.log1p(np.abs(diff)).reshape([1, 1, length, length])
+
+
 @expert_utils.add_name_scope()
 def attention_bias_proximal(length):
   """Bias for self-attention to encourage attention to close positions.
@@ -1009,6 +1150,8 @@ def attention_bias_proximal(length):
   Returns:
     a Tensor with shape [1, 1, length, length]
   """
+  if _is_static_size(length, length):
+    return tf.constant(_attention_bias_proximal_numpy(length))
   r = tf.to_float(tf.range(length))
   diff = tf.expand_dims(r, 0) - tf.expand_dims(r, 1)
   return tf.expand_dims(tf.expand_dims(-tf.log1p(tf.abs(diff)), 0), 0)
@@ -1052,7 +1195,7 @@ def attention_bias_batch(batch_coordinates_q,
 # Mask to prevent individual sequences of the same batch to attend to each other
 attention_bias_coordinates = functools.partial(
     attention_bias_batch,
-    condition_fn=lambda bias: tf.minimum(1.0, tf.abs(bias)),
+    condition_fn=lambda bias: tf.to_float(tf.not_equal(bias, 0.0)),
 )
 
 # Mask similar to upper triangular mask, but allow dispatching
@@ -1110,7 +1253,10 @@ def combine_first_two_dimensions(x):
   Returns:
     a Tensor with shape [ab, ...]
   """
-  ret = tf.reshape(x, tf.concat([[-1], common_layers.shape_list(x)[2:]], 0))
+  x_shape = common_layers.shape_list(x)
+  if all(isinstance(d, int) for d in x_shape):
+    return tf.reshape(x, [x_shape[0] * x_shape[1]] + x_shape[2:])
+  ret = tf.reshape(x, tf.concat([[-1], x_shape[2:]], 0))
   old_shape = x.get_shape().dims
   a, b = old_shape[:2]
   new_shape = [a * b if a and b else None] + old_shape[2:]
@@ -1187,16 +1333,19 @@ def attention_image_summary(attn, image_shapes=None):
         (query_rows, query_cols, query_channels,
          memory_rows, memory_cols, memory_channels).
   """
-  attn = tf.cast(attn, tf.float32)
+  # Only the first image is shown (max_outputs=1), so skip the rest.
+  attn = tf.cast(attn[:1], tf.float32)
   num_heads = common_layers.shape_list(attn)[1]
-  # [batch, query_length, memory_length, num_heads]
+  # [1, query_length, memory_length, num_heads]
   image = tf.transpose(attn, [0, 2, 3, 1])
-  image = tf.pow(image, 0.2)  # for high-dynamic-range
   # Each head will correspond to one of RGB.
   # pad the heads to be a multiple of 3
   image = tf.pad(image, [[0, 0], [0, 0], [0, 0], [0, tf.mod(-num_heads, 3)]])
   image = split_last_dimension(image, 3)
   image = tf.reduce_max(image, 4)
+  # pow is monotonic on the non-negative weights, so applying it after the
+  # max over heads gives the same image.
+  image = tf.pow(image, 0.2)  # for high-dynamic-range
   if image_shapes is not None:
     if len(image_shapes) == 4:
       q_rows, q_cols, m_rows, m_cols = list(image_shapes)
@@ -1330,8 +1479,12 @@ def grouped_attention_multihead(query_antecedent,
     q_requests = tf.one_hot(q_group, num_groups, axis=-1)
     m_requests = tf.to_float(tf.greater(m_pred_biased, 0.0))
     # include first memory position in all groups, to avoid division by zero.
-    m_requests = tf.maximum(
-        m_requests, tf.reshape(tf.one_hot([0], length_kv), [1, length_kv, 1]))
+    if isinstance(length_kv, int):
+      first_position = tf.constant(
+          np.eye(1, length_kv, dtype=np.float32).reshape([1, length_kv, 1]))
+    else:
+      first_position = tf.reshape(tf.one_hot([0], length_kv), [1, length_kv, 1])
+    m_requests = tf.maximum(m_requests, first_position)
     q_group_size = tf.reduce_sum(q_requests, 1)
     m_group_size = tf.reduce_sum(m_requests, 1)
     q_group_target_size = tf.to_float(length_q) / tf.to_float(num_groups)
@@ -1549,10 +1702,30 @@ def dot_product_attention(q,
     return tf.matmul(weights, v)
 
 
+@_cache_by_args
+def _generate_relative_positions_matrix_numpy(length_q, length_k,
+                                              max_relative_position, cache):
+  """NumPy version of _generate_relative_positions_matrix for static sizes."""
+  range_vec_k = np.arange(length_k, dtype=np.int32)
+  if not cache:
+    range_vec_q = range_vec_k[-length_q:]
+    distance_mat = range_vec_k[None, :] - range_vec_q[:, None]
+  else:
+    distance_mat = np.expand_dims(range_vec_k - (length_k - 1), 0)
+  return np.clip(distance_mat, -max_relative_position,
+                 max_relative_position) + max_relative_position
+
+
 def _generate_relative_positions_matrix(length_q, length_k,
                                         max_relative_position,
                                         cache=False):
   """Generates matrix of relative positions between inputs."""
+  if (_is_static_size(length_q, length_k) and
+      length_q * length_k <= _MAX_PER_LAYER_CONSTANT_SIZE and
+      isinstance(max_relative_position, int)):
+    return tf.constant(
+        _generate_relative_positions_matrix_numpy(
+            length_q, length_k, max_relative_position, cache))
   if not cache:
     if length_q == length_k:
       range_vec_q = range_vec_k = tf.range(length_q)
@@ -1587,7 +1760,8 @@ def _generate_relative_positions_embeddings(length_q, length_k, depth,
 def _relative_attention_inner(x, y, z, transpose):
   """Relative position-aware dot-product attention inner calculation.
 
-  This batches matrix multiply calculations to avoid unnecessary broadcasting.
+  The contraction with z batches over the query position, which einsum
+  expresses without explicit transposes of x or the result.
 
   Args:
     x: Tensor with shape [batch_size, heads, length or 1, length or depth].
@@ -1599,23 +1773,14 @@ def _relative_attention_inner(x, y, z, transpose):
   Returns:
     A Tensor with shape [batch_size, heads, length, length or depth].
   """
-  batch_size = tf.shape(x)[0]
-  heads = x.get_shape().as_list()[1]
-  length = tf.shape(x)[2]
-
   # xy_matmul is [batch_size, heads, length or 1, length or depth]
   xy_matmul = tf.matmul(x, y, transpose_b=transpose)
-  # x_t is [length or 1, batch_size, heads, length or depth]
-  x_t = tf.transpose(x, [2, 0, 1, 3])
-  # x_t_r is [length or 1, batch_size * heads, length or depth]
-  x_t_r = tf.reshape(x_t, [length, heads * batch_size, -1])
-  # x_tz_matmul is [length or 1, batch_size * heads, length or depth]
-  x_tz_matmul = tf.matmul(x_t_r, z, transpose_b=transpose)
-  # x_tz_matmul_r is [length or 1, batch_size, heads, length or depth]
-  x_tz_matmul_r = tf.reshape(x_tz_matmul, [length, batch_size, heads, -1])
-  # x_tz_matmul_r_t is [batch_size, heads, length or 1, length or depth]
-  x_tz_matmul_r_t = tf.transpose(x_tz_matmul_r, [1, 2, 0, 3])
-  return xy_matmul + x_tz_matmul_r_t
+  # xz_matmul is [batch_size, heads, length or 1, length or depth]
+  if transpose:
+    xz_matmul = tf.einsum("bhld,lmd->bhlm", x, z)
+  else:
+    xz_matmul = tf.einsum("bhlm,lmd->bhld", x, z)
+  return xy_matmul + xz_matmul
 
 
 def dot_product_attention_relative(q,
@@ -1697,7 +1862,7 @@ def dot_product_attention_relative(q,
       save_weights_to[scope.name] = weights
       save_weights_to[scope.name + "/logits"] = logits
     weights = tf.nn.dropout(weights, 1.0 - dropout_rate)
-    if not tf.get_variable_scope().reuse and make_image_summary:
+    if common_layers.should_generate_summaries() and make_image_summary:
       attention_image_summary(weights, image_shapes)
     return _relative_attention_inner(weights, v, relations_values, False)
 
@@ -2615,6 +2780,45 @@ def dot_product_unmasked_attention_local_2d_tpu_simple(
   return ret, q, k, v
 
 
+def _pad_to_multiple_1d(x, block_length):
+  """Pads the length dimension of x up to a multiple of block_length.
+
+  Args:
+    x: a Tensor with shape [batch, heads, length, depth]
+    block_length: an integer or scalar Tensor
+
+  Returns:
+    a Tensor with shape [batch, heads, padded_length, depth]. x itself if its
+    length is statically known to be a multiple of block_length.
+  """
+  length = common_layers.shape_list(x)[2]
+  if isinstance(length, int) and isinstance(block_length, int):
+    padding_size = -length % block_length
+    if not padding_size:
+      return x
+  else:
+    padding_size = tf.mod(-length, block_length)
+  return tf.pad(x, [[0, 0], [0, 0], [0, padding_size], [0, 0]])
+
+
+def _remove_padding_1d(x, original_length):
+  """Slices the length dimension of x back down to original_length.
+
+  Args:
+    x: a Tensor with shape [batch, heads, padded_length, depth]
+    original_length: an integer or scalar Tensor
+
+  Returns:
+    a Tensor with shape [batch, heads, original_length, depth]. x itself if its
+    length is statically known to equal original_length.
+  """
+  length = common_layers.shape_list(x)[2]
+  if (isinstance(length, int) and isinstance(original_length, int) and
+      length == original_length):
+    return x
+  return tf.slice(x, [0, 0, 0, 0], [-1, -1, original_length, -1])
+
+
 def masked_within_block_local_attention_1d(q, k, v, block_length=64, name=None):
   """Attention to the source and a neighborhood to the left within a block.
 
@@ -2643,12 +2847,10 @@ def masked_within_block_local_attention_1d(q, k, v, block_length=64, name=None):
 
     # Pad query, key, value to ensure multiple of block length.
     original_length = length
-    padding_size = tf.mod(-length, block_length)
-    length += padding_size
-    padding = [[0, 0], [0, 0], [0, padding_size], [0, 0]]
-    q = tf.pad(q, padding)
-    k = tf.pad(k, padding)
-    v = tf.pad(v, padding)
+    q = _pad_to_multiple_1d(q, block_length)
+    k = _pad_to_multiple_1d(k, block_length)
+    v = _pad_to_multiple_1d(v, block_length)
+    length = common_layers.shape_list(q)[2]
 
     # Compute attention for all subsequent query blocks.
     num_blocks = tf.div(length, block_length)
@@ -2665,9 +2867,9 @@ def masked_within_block_local_attention_1d(q, k, v, block_length=64, name=None):
     output = tf.reshape(output, [batch, heads, -1, depth_v])
 
     # Remove the padding if introduced.
-    output = tf.slice(output, [0, 0, 0, 0], [-1, -1, original_length, -1])
+    output = _remove_padding_1d(output, original_length)
     output.set_shape([None if isinstance(dim, tf.Tensor) else dim for dim in
-                      (batch, heads, length, depth_v)])
+                      (batch, heads, original_length, depth_v)])
     return output
 
 
@@ -2743,12 +2945,10 @@ def masked_local_attention_1d(q,
 
     # Pad query, key, value to ensure multiple of block length.
     original_length = length
-    padding_size = tf.mod(-length, block_length)
-    length += padding_size
-    padding = [[0, 0], [0, 0], [0, padding_size], [0, 0]]
-    q = tf.pad(q, padding)
-    k = tf.pad(k, padding)
-    v = tf.pad(v, padding)
+    q = _pad_to_multiple_1d(q, block_length)
+    k = _pad_to_multiple_1d(k, block_length)
+    v = _pad_to_multiple_1d(v, block_length)
+    length = common_layers.shape_list(q)[2]
 
     if isinstance(length, int) and isinstance(block_length, int):
       num_blocks = length // block_length
@@ -2784,13 +2984,8 @@ def masked_local_attention_1d(q,
     local_length = common_layers.shape_list(local_k)[3]
 
     # make sure source_pos <= target_pos
-    good_part = common_layers.ones_matrix_band_part(
-        block_length,
-        local_length,
-        -1,
-        block_length,
-        out_shape=[1, 1, 1, block_length, local_length])
-    bias = (1.0 - good_part) * -1e9
+    bias = _attention_bias_band(block_length, local_length, -1, block_length,
+                                [1, 1, 1, block_length, local_length])
     # TODO(noam): figure out how to show a summary for the remaining blocks.
     # The naive way currently causes errors due to empty tensors.
     # output: [batch, heads, num_blocks-1, block_length, depth_v]
@@ -2807,7 +3002,7 @@ def masked_local_attention_1d(q,
     output = tf.concat([first_output, tail_output], axis=2)
 
     # Remove the padding if introduced.
-    output = tf.slice(output, [0, 0, 0, 0], [-1, -1, original_length, -1])
+    output = _remove_padding_1d(output, original_length)
     output = tf.reshape(output, [batch, heads, original_length, depth_v])
     return output
 
@@ -2883,12 +3078,10 @@ def masked_relative_local_attention_1d(q,
     depth_k = common_layers.shape_list(k)[3]
     depth_v = common_layers.shape_list(v)[3]
     original_length = length
-    padding_size = tf.mod(-length, block_length)
-    length += padding_size
-    padding = [[0, 0], [0, 0], [0, padding_size], [0, 0]]
-    q = tf.pad(q, padding)
-    k = tf.pad(k, padding)
-    v = tf.pad(v, padding)
+    q = _pad_to_multiple_1d(q, block_length)
+    k = _pad_to_multiple_1d(k, block_length)
+    v = _pad_to_multiple_1d(v, block_length)
+    length = common_layers.shape_list(q)[2]
 
     num_blocks = length // block_length
     # compute attention for the first query block.
@@ -2969,12 +3162,10 @@ def masked_relative_local_attention_1d(q,
     all_logits = (
         tf.matmul(rel_tail_q, rel_k, transpose_b=True) + all_rel_logits)
     # make sure source_pos <= target_pos
-    good_part = common_layers.ones_matrix_band_part(block_length,
-                                                    local_length,
-                                                    -1, block_length)
-    mask = (1.0 - good_part) * -1e9
+    mask = _attention_bias_band(block_length, local_length, -1, block_length,
+                                [1, 1, block_length, local_length])
     mask = common_layers.cast_like(mask, all_logits)
-    all_logits += tf.reshape(mask, [1, 1, block_length, local_length])
+    all_logits += mask
     weights = tf.nn.softmax(all_logits, name="attention_weights")
     # [batch (* num_blocks), heads, query_length (=block_length),
     # key_length (=2*block_length)]
@@ -3028,7 +3219,7 @@ def masked_relative_local_attention_1d(q,
     output = tf.reshape(
         output, [batch, heads, (num_blocks - 1) * block_length, depth_v])
     output = tf.concat([first_output, output], axis=2)
-    output = tf.slice(output, [0, 0, 0, 0], [-1, -1, original_length, -1])
+    output = _remove_padding_1d(output, original_length)
     output = tf.reshape(output, [batch, heads, original_length, depth_v])
     return output
 
@@ -3077,16 +3268,12 @@ def local_attention_1d(q, k, v, block_length=128, filter_width=100, name=None):
     batch_size, num_heads, original_length, _ = common_layers.shape_list(q)
 
     # Pad query, key, value to ensure multiple of corresponding lengths.
-    def pad_to_multiple(x, pad_length):
-      x_length = common_layers.shape_list(x)[2]
-      return tf.pad(x, [[0, 0], [0, 0], [0, -x_length % pad_length], [0, 0]])
-
     def pad_l_and_r(x, pad_length):
       return tf.pad(x, [[0, 0], [0, 0], [pad_length, pad_length], [0, 0]])
 
     # Set up query blocks.
     # [batch, heads, blocks_q, block_length, depth_k]
-    q = pad_to_multiple(q, block_length)
+    q = _pad_to_multiple_1d(q, block_length)
     q = reshape_by_blocks(q, common_layers.shape_list(q), block_length)
     total_query_blocks = common_layers.shape_list(q)[2]
 
@@ -3094,8 +3281,8 @@ def local_attention_1d(q, k, v, block_length=128, filter_width=100, name=None):
     # [batch, heads, blocks_k, block_length, depth_k]
     blocks_per_filter_width = filter_width // block_length
     remaining_items = filter_width % block_length
-    k = pad_to_multiple(k, block_length)
-    v = pad_to_multiple(v, block_length)
+    k = _pad_to_multiple_1d(k, block_length)
+    v = _pad_to_multiple_1d(v, block_length)
     k = pad_l_and_r(k, filter_width + block_length - remaining_items)
     v = pad_l_and_r(v, filter_width + block_length - remaining_items)
     k = reshape_by_blocks(k, common_layers.shape_list(k), block_length)
@@ -3148,7 +3335,7 @@ def local_attention_1d(q, k, v, block_length=128, filter_width=100, name=None):
     output = tf.reshape(output, [batch_size, num_heads, -1, depth_v])
 
     # Remove the padding if introduced.
-    output = tf.slice(output, [0, 0, 0, 0], [-1, -1, original_length, -1])
+    output = _remove_padding_1d(output, original_length)
     output.set_shape([None if isinstance(dim, tf.Tensor) else dim for dim in
                       (batch_size, num_heads, original_length, depth_v)])
     return output
@@ -3173,6 +3360,42 @@ def reshape_by_blocks(x, x_shape, memory_block_size):
   return x
 
 
+def _num_block_indices_1d(length, block_size, block_stride):
+  """Number of indices _block_gather_indices_1d returns for an int length."""
+  return ((length - block_size) // block_stride + 1) * block_size
+
+
+@_cache_by_args
+def _block_gather_indices_1d_numpy(length, block_size, block_stride):
+  """NumPy version of _block_gather_indices_1d for a static length."""
+  num_blocks = (length - block_size) // block_stride + 1
+  return (np.arange(num_blocks, dtype=np.int32)[:, None] * block_stride +
+          np.arange(block_size, dtype=np.int32)[None, :])
+
+
+def _block_gather_indices_1d(length, block_size, block_stride):
+  """Indices of the strided, possibly overlapping blocks of a sequence.
+
+  Args:
+    length: an integer or scalar Tensor, the length of the sequence.
+    block_size: an integer, the length of each block.
+    block_stride: an integer, the distance between block starts.
+
+  Returns:
+    an int32 Tensor with shape [num_blocks, block_size], where row i holds
+    positions i * block_stride ... i * block_stride + block_size - 1.
+  """
+  # Overlapping blocks repeat positions, so the indices can outnumber length.
+  if (_is_static_size(length) and
+      _num_block_indices_1d(length, block_size, block_stride) <=
+      _MAX_PER_LAYER_CONSTANT_SIZE):
+    return tf.constant(
+        _block_gather_indices_1d_numpy(length, block_size, block_stride))
+  num_blocks = (length - block_size) // block_stride + 1
+  return (tf.expand_dims(tf.range(num_blocks) * block_stride, 1) +
+          tf.expand_dims(tf.range(block_size), 0))
+
+
 def dilated_self_attention_1d(q,
                               k,
                               v,
@@ -3208,16 +3431,12 @@ def dilated_self_attention_1d(q,
     original_length = common_layers.shape_list(q)[2]
 
     # Pad query, key, value to ensure multiple of corresponding lengths.
-    def pad_to_multiple(x, pad_length):
-      x_length = common_layers.shape_list(x)[2]
-      return tf.pad(x, [[0, 0], [0, 0], [0, -x_length % pad_length], [0, 0]])
-
     def pad_l_and_r(x, pad_length):
       return tf.pad(x, [[0, 0], [0, 0], [pad_length, pad_length], [0, 0]])
 
-    q = pad_to_multiple(q, query_block_size)
-    v = pad_to_multiple(v, query_block_size)
-    k = pad_to_multiple(k, query_block_size)
+    q = _pad_to_multiple_1d(q, query_block_size)
+    v = _pad_to_multiple_1d(v, query_block_size)
+    k = _pad_to_multiple_1d(k, query_block_size)
 
     # Set up query blocks.
     new_q_shape = common_layers.shape_list(q)
@@ -3232,17 +3451,8 @@ def dilated_self_attention_1d(q,
 
     # Get gather indices.
     index_length = (new_q_shape[2] - query_block_size + memory_block_size)
-    indices = tf.range(0, index_length, delta=1, name="index_range")
-    indices = tf.reshape(indices, [1, -1, 1])  # [1, length, 1] for convs
-    kernel = tf.expand_dims(tf.eye(memory_block_size), axis=1)
-    gather_indices = tf.nn.conv1d(
-        tf.cast(indices, tf.float32),
-        kernel,
-        query_block_size,
-        padding="VALID",
-        name="gather_conv")
-
-    gather_indices = tf.squeeze(tf.cast(gather_indices, tf.int32), axis=0)
+    gather_indices = _block_gather_indices_1d(index_length, memory_block_size,
+                                              query_block_size)
 
     # Get left and right memory blocks for each query.
     # [length, batch, heads, dim]
@@ -3288,7 +3498,7 @@ def dilated_self_attention_1d(q,
     output = tf.reshape(output, [batch_size, num_heads, -1, depth_v])
 
     # Remove the padding if introduced.
-    output = tf.slice(output, [0, 0, 0, 0], [-1, -1, original_length, -1])
+    output = _remove_padding_1d(output, original_length)
     output.set_shape(v_list_shape)
     return output
 
@@ -3315,28 +3525,44 @@ def gather_dilated_memory_blocks(x,
   Returns:
     Tensor of shape [batch, heads, blocks, block_length, depth]
   """
-  gathered_blocks = []
-  # gathering memory blocks
+  # Gathering from x[block_start_index:] is the same as gathering from x with
+  # the indices shifted by block_start_index, so all memory blocks can be
+  # fetched with a single gather.
+  block_gather_indices = []
   for block_id in range(num_memory_blocks):
     block_end_index = -(query_block_size + gap_size *
                         (block_id + 1) + memory_block_size * block_id)
     block_start_index = (
         (memory_block_size + gap_size) * (num_memory_blocks - (block_id + 1)))
     if direction != "left":
-      [block_end_index,
-       block_start_index] = [-block_start_index, -block_end_index]
-    if block_end_index == 0:
-      x_block = x[block_start_index:]
-    else:
-      x_block = x[block_start_index:block_end_index]
+      block_start_index = -block_end_index
+    block_gather_indices.append(gather_indices + block_start_index)
+  # [blocks, num_memory_blocks * block_length]
+  block_gather_indices = tf.concat(block_gather_indices, 1)
+  x_new = tf.gather(x, block_gather_indices)
+  # [batch, heads, blocks, num_memory_blocks * block_length, dim]
+  return tf.transpose(x_new, [2, 3, 0, 1, 4])
+
+
+def _concat_attention_biases(first_bias, second_bias):
+  """Concatenates two attention biases along the memory (last) dimension.
+
+  The biases only need to be broadcastable in their other dimensions. Each is
+  zero-padded to the combined memory length and the two are added, so neither
+  has to be tiled to the full shape first.
 
-    def gather_dilated_1d_blocks(x, gather_indices):
-      x_new = tf.gather(x, gather_indices)
-      # [batch, heads, blocks, block_length, dim]
-      return tf.transpose(x_new, [2, 3, 0, 1, 4])
+  Args:
+    first_bias: a Tensor with shape [..., memory_length_1]
+    second_bias: a Tensor with shape [..., memory_length_2], of the same rank
 
-    gathered_blocks.append(gather_dilated_1d_blocks(x_block, gather_indices))
-  return tf.concat(gathered_blocks, 3)
+  Returns:
+    a Tensor with shape [..., memory_length_1 + memory_length_2]
+  """
+  first_length = common_layers.shape_list(first_bias)[-1]
+  second_length = common_layers.shape_list(second_bias)[-1]
+  paddings = [[0, 0]] * (first_bias.get_shape().ndims - 1)
+  return (tf.pad(first_bias, paddings + [[0, second_length]]) +
+          tf.pad(second_bias, paddings + [[first_length, 0]]))
 
 
 def masked_dilated_self_attention_1d(q,
@@ -3374,16 +3600,12 @@ def masked_dilated_self_attention_1d(q,
     original_length = common_layers.shape_list(q)[2]
 
     # Pad query, key, value to ensure multiple of corresponding lengths.
-    def pad_to_multiple(x, pad_length):
-      x_length = common_layers.shape_list(x)[2]
-      return tf.pad(x, [[0, 0], [0, 0], [0, -x_length % pad_length], [0, 0]])
-
     def pad_l(x, left_pad_length):
       return tf.pad(x, [[0, 0], [0, 0], [left_pad_length, 0], [0, 0]])
 
-    q = pad_to_multiple(q, query_block_size)
-    v = pad_to_multiple(v, query_block_size)
-    k = pad_to_multiple(k, query_block_size)
+    q = _pad_to_multiple_1d(q, query_block_size)
+    v = _pad_to_multiple_1d(v, query_block_size)
+    k = _pad_to_multiple_1d(k, query_block_size)
 
     # Set up query blocks.
     new_q_shape = common_layers.shape_list(q)
@@ -3398,17 +3620,8 @@ def masked_dilated_self_attention_1d(q,
 
     # Get gather indices.
     index_length = (new_q_shape[2] - query_block_size + memory_block_size)
-
-    indices = tf.range(0, index_length, delta=1, name="index_range")
-    indices = tf.reshape(indices, [1, -1, 1])  # [1, length, 1] for convs
-    kernel = tf.expand_dims(tf.eye(memory_block_size), axis=1)
-    gather_indices = tf.nn.conv1d(
-        tf.cast(indices, tf.float32),
-        kernel,
-        query_block_size,
-        padding="VALID",
-        name="gather_conv")
-    gather_indices = tf.squeeze(tf.cast(gather_indices, tf.int32), axis=0)
+    gather_indices = _block_gather_indices_1d(index_length, memory_block_size,
+                                              query_block_size)
 
     # Get left and right memory blocks for each query.
     # [length, batch, heads, dim]
@@ -3423,16 +3636,12 @@ def masked_dilated_self_attention_1d(q,
         gather_indices)
 
     # Combine memory windows.
-    block_q_shape = common_layers.shape_list(q)
-    masked_attention_bias = tf.tile(
-        tf.expand_dims(attention_bias_lower_triangle(query_block_size), axis=0),
-        [block_q_shape[0], block_q_shape[1], block_q_shape[2], 1, 1])
+    masked_attention_bias = tf.expand_dims(
+        attention_bias_lower_triangle(query_block_size), axis=0)
     padding_attention_bias = tf.expand_dims(
         embedding_to_padding(k_unmasked_windows) * -1e9, axis=-2)
-    padding_attention_bias = tf.tile(padding_attention_bias,
-                                     [1, 1, 1, query_block_size, 1])
-    attention_bias = tf.concat(
-        [masked_attention_bias, padding_attention_bias], axis=-1)
+    attention_bias = _concat_attention_biases(masked_attention_bias,
+                                              padding_attention_bias)
     # combine memory windows
     k_windows = tf.concat([self_k_part, k_unmasked_windows], 3)
     v_windows = tf.concat([self_v_part, v_unmasked_windows], 3)
@@ -3447,7 +3656,7 @@ def masked_dilated_self_attention_1d(q,
     output = tf.reshape(output, [batch_size, num_heads, -1, depth_v])
 
     # Remove the padding if introduced.
-    output = tf.slice(output, [0, 0, 0, 0], [-1, -1, original_length, -1])
+    output = _remove_padding_1d(output, original_length)
     output.set_shape(v_list_shape)
     return output
 
@@ -3493,8 +3702,7 @@ def local_attention_2d(q,
     v = tf.pad(v, paddings)
 
     # Set up query blocks.
-    q_indices = gather_indices_2d(q, query_shape, query_shape)
-    q_new = gather_blocks_2d(q, q_indices)
+    q_new = _gather_blocks_2d_by_reshape(q, query_shape)
 
     # Set up key and value blocks.
     memory_shape = (query_shape[0] + 2 * memory_flange[0],
@@ -3504,7 +3712,7 @@ def local_attention_2d(q,
     v_new = gather_blocks_2d(v, k_and_v_indices)
 
     attention_bias = tf.expand_dims(
-        tf.to_float(embedding_to_padding(k_new)) * -1e9, axis=-2)
+        embedding_to_padding(k_new) * -1e9, axis=-2)
     output = dot_product_attention(
         q_new,
         k_new,
@@ -3515,11 +3723,10 @@ def local_attention_2d(q,
         make_image_summary=False)
     # Put representations back into original shapes.
     padded_q_shape = common_layers.shape_list(q)
-    output = scatter_blocks_2d(output, q_indices, padded_q_shape)
+    output = _scatter_blocks_2d_by_reshape(output, padded_q_shape, query_shape)
 
     # Remove the padding if introduced.
-    output = tf.slice(output, [0, 0, 0, 0, 0],
-                      [-1, -1, v_shape[2], v_shape[3], -1])
+    output = _remove_padding_2d(output, v_shape[2], v_shape[3])
     return output
 
 
@@ -3544,6 +3751,8 @@ def pad_to_multiple_2d(x, block_shape):
     width_padding = -common_layers.shape_list(x)[3] % block_shape[1]
     paddings = [[0, 0], [0, 0], [0, height_padding], [0, width_padding], [0, 0]]
 
+  if all(isinstance(p, int) and not p for p in [height_padding, width_padding]):
+    return x
   padded_x = tf.pad(x, paddings)
   padded_shape = padded_x.get_shape().as_list()
   padded_shape = padded_shape[:-1] + [last]
@@ -3551,6 +3760,25 @@ def pad_to_multiple_2d(x, block_shape):
   return padded_x
 
 
+def _remove_padding_2d(x, height, width):
+  """Slices the height and width dimensions of x back down to the originals.
+
+  Args:
+    x: a Tensor with shape [batch, heads, padded_h, padded_w, depth]
+    height: an integer or scalar Tensor
+    width: an integer or scalar Tensor
+
+  Returns:
+    a Tensor with shape [batch, heads, height, width, depth]. x itself if its
+    height and width are statically known to equal the given ones.
+  """
+  x_shape = common_layers.shape_list(x)
+  if (all(isinstance(dim, int) for dim in x_shape[2:4] + [height, width]) and
+      x_shape[2:4] == [height, width]):
+    return x
+  return tf.slice(x, [0, 0, 0, 0, 0], [-1, -1, height, width, -1])
+
+
 def reshape_range(tensor, i, j, shape):
   """Reshapes a tensor between dimensions i and j."""
   t_shape = common_layers.shape_list(tensor)
@@ -3582,68 +3810,129 @@ def scatter_blocks_2d(x, indices, shape):
   return tf.reshape(scattered_x, shape)
 
 
-def gather_indices_2d(x, block_shape, block_stride):
-  """Getting gather indices."""
-  # making an identity matrix kernel
-  kernel = tf.eye(block_shape[0] * block_shape[1])
-  kernel = reshape_range(kernel, 0, 1, [block_shape[0], block_shape[1], 1])
-  # making indices [1, h, w, 1] to appy convs
-  x_shape = common_layers.shape_list(x)
-  indices = tf.range(x_shape[2] * x_shape[3])
-  indices = tf.reshape(indices, [1, x_shape[2], x_shape[3], 1])
-  indices = tf.nn.conv2d(
-      tf.cast(indices, tf.float32),
-      kernel,
-      strides=[1, block_stride[0], block_stride[1], 1],
-      padding="VALID")
-  # making indices [num_blocks, dim] to gather
-  dims = common_layers.shape_list(indices)[:3]
-  if all([isinstance(dim, int) for dim in dims]):
-    num_blocks = functools.reduce(operator.mul, dims, 1)
-  else:
-    num_blocks = tf.reduce_prod(dims)
-  indices = tf.reshape(indices, [num_blocks, -1])
-  return tf.cast(indices, tf.int32)
+@_cache_by_args
+def _gather_indices_2d_numpy(height, width, block_shape, block_stride):
+  """NumPy version of gather_indices_2d for a static height and width."""
+  rows = _block_gather_indices_1d_numpy(height, block_shape[0], block_stride[0])
+  cols = _block_gather_indices_1d_numpy(width, block_shape[1], block_stride[1])
+  # [num_blocks_h, num_blocks_w, block_h, block_w]
+  indices = (rows[:, None, :, None] * width + cols[None, :, None, :])
+  return indices.reshape([-1, block_shape[0] * block_shape[1]])
 
 
-def make_2d_block_raster_mask(query_shape, memory_flange):
-  """Creates a mask for 2d block raster scan.
+def _gather_blocks_2d_by_reshape(x, block_shape):
+  """Splits x into non-overlapping, flattened 2d blocks.
+
+  Same as gather_blocks_2d(x, gather_indices_2d(x, block_shape, block_shape))
+  but with a reshape and a single transpose instead of a gather.
 
-  The query mask can look to the left, top left, top, and top right, but
-  not to the right. Inside the query, we have the standard raster scan
-  masking.
   Args:
-    query_shape: A tuple of ints (query_height, query_width)
-    memory_flange: A tuple of ints
-      (memory_flange_height, memory_flange_width)
+    x: a Tensor with shape [batch, heads, height, width, depth], where height
+      and width are multiples of block_shape.
+    block_shape: a tuple of two integers.
 
   Returns:
-    A tensor of shape query_size, memory_size
+    a Tensor with shape [batch, heads, num_blocks, block_h * block_w, depth]
   """
+  batch, heads, height, width, depth = common_layers.shape_list(x)
+  block_h, block_w = block_shape
+  num_blocks_h = height // block_h
+  num_blocks_w = width // block_w
+  x = tf.reshape(
+      x, [batch, heads, num_blocks_h, block_h, num_blocks_w, block_w, depth])
+  x = tf.transpose(x, [0, 1, 2, 4, 3, 5, 6])
+  return tf.reshape(x, [
+      batch, heads, num_blocks_h * num_blocks_w, block_h * block_w, depth])
+
+
+def _scatter_blocks_2d_by_reshape(x, shape, block_shape):
+  """Inverse of _gather_blocks_2d_by_reshape.
+
+  Args:
+    x: a Tensor with shape [batch, heads, num_blocks, block_h * block_w, depth]
+    shape: the shape [batch, heads, height, width, depth] to restore, a list.
+    block_shape: a tuple of two integers.
+
+  Returns:
+    a Tensor with shape shape.
+  """
+  batch, heads, height, width, depth = shape
+  block_h, block_w = block_shape
+  x = tf.reshape(x, [
+      batch, heads, height // block_h, width // block_w, block_h, block_w,
+      depth
+  ])
+  x = tf.transpose(x, [0, 1, 2, 4, 3, 5, 6])
+  return tf.reshape(x, shape)
+
+
+def gather_indices_2d(x, block_shape, block_stride):
+  """Getting gather indices."""
+  x_shape = common_layers.shape_list(x)
+  height, width = x_shape[2], x_shape[3]
+  # Overlapping blocks repeat positions, so the indices can outnumber them.
+  if (_is_static_size(height, width) and
+      _num_block_indices_1d(height, block_shape[0], block_stride[0]) *
+      _num_block_indices_1d(width, block_shape[1], block_stride[1]) <=
+      _MAX_PER_LAYER_CONSTANT_SIZE):
+    return tf.constant(
+        _gather_indices_2d_numpy(height, width, tuple(block_shape),
+                                 tuple(block_stride)))
+  rows = _block_gather_indices_1d(height, block_shape[0], block_stride[0])
+  cols = _block_gather_indices_1d(width, block_shape[1], block_stride[1])
+  # [num_blocks_h, num_blocks_w, block_h, block_w]
+  indices = (tf.expand_dims(tf.expand_dims(rows, 1), 3) * width +
+             tf.expand_dims(tf.expand_dims(cols, 0), 2))
+  return tf.reshape(indices, [-1, block_shape[0] * block_shape[1]])
+
+
+@_cache_by_args
+def _make_2d_block_raster_mask_numpy(query_shape, memory_flange):
+  """NumPy version of make_2d_block_raster_mask."""
+  query_size = query_shape[0] * query_shape[1]
   # mask inside the query block
-  query_triangle = common_layers.ones_matrix_band_part(
-      np.prod(query_shape), np.prod(query_shape), -1, 0)
-  split_query_masks = tf.split(query_triangle, query_shape[0], axis=1)
+  query_triangle = np.tril(np.ones([query_size, query_size]))
+  split_query_masks = np.split(query_triangle, query_shape[0], axis=1)
   # adding mask for left and right
   mask_pieces = [
-      tf.concat(  # pylint: disable=g-complex-comprehension
-          [tf.ones([np.prod(query_shape), memory_flange[1]]),
+      np.concatenate(  # pylint: disable=g-complex-comprehension
+          [np.ones([query_size, memory_flange[1]]),
            split_query_masks[i],
-           tf.zeros([np.prod(query_shape), memory_flange[1]])],
+           np.zeros([query_size, memory_flange[1]])],
           axis=1) for i in range(query_shape[0])
   ]
   # adding mask for top
-  final_mask = tf.concat(
+  final_mask = np.concatenate(
       [
-          tf.ones([
-              np.prod(query_shape),
+          np.ones([
+              query_size,
               (query_shape[1] + 2 * memory_flange[1]) * memory_flange[0]
           ]),
-          tf.concat(mask_pieces, axis=1)
+          np.concatenate(mask_pieces, axis=1)
       ],
       axis=1)
   # 0.0 is visible location, 1.0 is masked.
-  return 1. - final_mask
+  return (1. - final_mask).astype(np.float32)
+
+
+def make_2d_block_raster_mask(query_shape, memory_flange):
+  """Creates a mask for 2d block raster scan.
+
+  The query mask can look to the left, top left, top, and top right, but
+  not to the right. Inside the query, we have the standard raster scan
+  masking.
+  Args:
+    query_shape: A tuple of ints (query_height, query_width)
+    memory_flange: A tuple of ints
+      (memory_flange_height, memory_flange_width)
+
+  Returns:
+    A tensor of shape query_size, memory_size
+  """
+  return tf.constant(
+      _make_2d_block_raster_mask_numpy(
+          tuple(int(d) for d in query_shape),
+          tuple(int(d) for d in memory_flange)))
 
 
 def get_memory_region(x, query_block_shape, memory_flange, q_indices):
@@ -3748,7 +4037,7 @@ def right_shift_blockwise(x, query_shape, name=None):
     x_new = get_shifted_center_blocks(x, x_indices)
 
     # Put representations back into original shapes.
-    output = scatter_blocks_2d(x_new, x_indices, padded_x_shape)
+    output = _scatter_blocks_2d_by_reshape(x_new, padded_x_shape, query_shape)
     # Remove the dummy head dimension.
     output = tf.squeeze(output, axis=1)
     # Remove the padding if introduced.
@@ -3796,7 +4085,7 @@ def masked_local_attention_2d(q,
 
     # Set up query blocks.
     q_indices = gather_indices_2d(q, query_shape, query_shape)
-    q_new = gather_blocks_2d(q, q_indices)
+    q_new = _gather_blocks_2d_by_reshape(q, query_shape)
 
     # Set up key and value blocks.
     k_flange, k_center = get_memory_region(k, query_shape, memory_flange,
@@ -3811,24 +4100,16 @@ def masked_local_attention_2d(q,
       v_new = v_center
 
     # Set up the masks.
-    query_elements = np.prod(query_shape)
-    padding_mask = None
+    query_elements = int(np.prod(query_shape))
+    center_attention_bias = attention_bias_lower_triangle(query_elements)
+    center_attention_bias = tf.reshape(
+        center_attention_bias, [1, 1, 1, query_elements, query_elements])
     if k_flange is not None:
       padding_mask = tf.expand_dims(
           embedding_to_padding(k_flange) * -1e9, axis=-2)
-      padding_mask = tf.tile(padding_mask, [1, 1, 1, query_elements, 1])
-
-    center_attention_bias = attention_bias_lower_triangle(
-        np.prod(query_elements))
-    center_attention_bias = tf.reshape(
-        center_attention_bias, [1, 1, 1, query_elements, query_elements])
-    v_center_shape = common_layers.shape_list(v_center)
-    center_attention_bias = tf.tile(
-        center_attention_bias,
-        [v_center_shape[0], v_center_shape[1], v_center_shape[2], 1, 1])
-    if padding_mask is not None:
       # Combine the mask for padding and visible region.
-      attention_bias = tf.concat([padding_mask, center_attention_bias], axis=4)
+      attention_bias = _concat_attention_biases(padding_mask,
+                                                center_attention_bias)
     else:
       attention_bias = center_attention_bias
 
@@ -3842,11 +4123,10 @@ def masked_local_attention_2d(q,
         make_image_summary=False)
     # Put representations back into original shapes.
     padded_q_shape = common_layers.shape_list(q)
-    output = scatter_blocks_2d(output, q_indices, padded_q_shape)
+    output = _scatter_blocks_2d_by_reshape(output, padded_q_shape, query_shape)
 
     # Remove the padding if introduced.
-    output = tf.slice(output, [0, 0, 0, 0, 0],
-                      [-1, -1, v_shape[2], v_shape[3], -1])
+    output = _remove_padding_2d(output, v_shape[2], v_shape[3])
     return output
 
 
@@ -4407,14 +4687,11 @@ def ffn_self_attention_layer(x,
           common_layers.dense(
               x, filter_depth, use_bias=False, name="q_transform"),
           axis=2)
-      kv_combined = tf.expand_dims(
+      # Keys and values share the transform, so they are the same tensor.
+      k = v = tf.expand_dims(
           common_layers.dense(
-              tf.concat([x, x], axis=1),
-              filter_depth,
-              use_bias=False,
-              name="kv_transform"),
+              x, filter_depth, use_bias=False, name="kv_transform"),
           axis=2)
-      k, v = tf.split(kv_combined, [x_shape[1], x_shape[1]], axis=1)
 
     batch_q = tf.reshape(q, [-1, 1, num_parts, part_depth])
     batch_k = tf.reshape(k, [-1, 1, num_parts, part_depth])
@@ -4486,15 +4763,12 @@ def parameter_attention(x,
       v = tf.nn.dropout(
           v, 1.0 - dropout_rate, noise_shape=[num_heads, memory_rows, 1])
     # query is [batch, length, hidden_size]
-    # reshape and transpose it to [heads, batch * length, head_size]
+    # reshape it to [batch, length, heads, head_size]
     q = tf.reshape(q, [batch_size, length, num_heads, head_size_k])
-    q = tf.transpose(q, [2, 0, 1, 3])
-    q = tf.reshape(q, [num_heads, batch_size * length, head_size_k])
-    weights = tf.matmul(q, k, transpose_b=True)
+    # [heads, batch, length, memory_rows]
+    weights = tf.einsum("blhd,hmd->hblm", q, k)
     weights = tf.nn.softmax(weights)
-    y = tf.matmul(weights, v)
-    y = tf.reshape(y, [num_heads, batch_size, length, head_size_v])
-    y = tf.transpose(y, [1, 2, 0, 3])
+    y = tf.einsum("hblm,hmd->blhd", weights, v)
     y = tf.reshape(y, [batch_size, length, total_value_depth])
     y.set_shape([None, None, total_value_depth])
     y = common_layers.dense(
@@ -4520,7 +4794,7 @@ def coordinate_tensor(shape, axis):
   r = tf.range(shape[axis])
   r_shape = tf.one_hot(
       axis, tf.size(shape), on_value=-1, off_value=1, dtype=tf.int32)
-  return tf.zeros(shape, dtype=tf.int32) + tf.reshape(r, r_shape)
+  return tf.broadcast_to(tf.reshape(r, r_shape), shape)
 
 
 def self_attention_expert(x,
@@ -4571,7 +4845,8 @@ def self_attention_expert(x,
       lambda: length,
   )
 
-  tf.summary.scalar("batch_size", length, family="experts_stats_batch_size")
+  if common_layers.should_generate_summaries():
+    tf.summary.scalar("batch_size", length, family="experts_stats_batch_size")
 
   attention_kq_size = attention_kq_size or depth
   attention_v_size = attention_v_size or depth
@@ -5365,7 +5640,11 @@ def scaled_dot_product_attention_simple(q, k, v, bias, name=None):
   """
   with tf.variable_scope(
       name, default_name="scaled_dot_product_attention_simple"):
-    scalar = tf.rsqrt(tf.to_float(common_layers.shape_list(q)[2]))
+    depth_k = common_layers.shape_list(q)[2]
+    if isinstance(depth_k, int):
+      scalar = depth_k**-0.5
+    else:
+      scalar = tf.rsqrt(tf.to_float(depth_k))
     logits = tf.matmul(q * scalar, k, transpose_b=True)
     if bias is not None:
       logits += bias
@@ -44,6 +44,82 @@ class CommonAttentionTest(parameterized.TestCase, tf.test.TestCase):
     res = self.evaluate(y)
     self.assertEqual(res.shape, (5, 3, 12))
 
+  @parameterized.parameters(
+      {"length": 7, "channels": 12, "start_index": 0},
+      {"length": 5, "channels": 9, "start_index": 3},
+  )
+  @test_utils.run_in_graph_and_eager_modes()
+  def testGetTimingSignal1dStatic(self, length, channels, start_index):
+    static = common_attention.get_timing_signal_1d(
+        length, channels, start_index=start_index)
+    dynamic = common_attention.get_timing_signal_1d(
+        tf.constant(length), channels, start_index=start_index)
+    static_res, dynamic_res = self.evaluate([static, dynamic])
+    self.assertEqual(static_res.shape, (1, length, channels))
+    self.assertAllClose(static_res, dynamic_res, atol=1e-5)
+
+  def testCacheByArgsKeepsRecentEntries(self):
+    calls = []
+
+    @common_attention._cache_by_args
+    def square(x):
+      calls.append(x)
+      return x * x
+
+    for x in range(common_attention._CACHE_MAX_ENTRIES + 1):
+      self.assertEqual(square(x), x * x)
+    self.assertEqual(square(common_attention._CACHE_MAX_ENTRIES),
+                     common_attention._CACHE_MAX_ENTRIES ** 2)
+    self.assertEqual(square(0), 0)
+    self.assertEqual(
+        calls, list(range(common_attention._CACHE_MAX_ENTRIES + 1)) + [0])
+
+  @test_utils.run_in_graph_and_eager_modes()
+  def testAddTimingSignalNdMatches1d(self):
+    x = tf.constant(np.random.rand(2, 5, 12), dtype=tf.float32)
+    res_nd, res_1d = self.evaluate([
+        common_attention.add_timing_signal_nd(x),
+        common_attention.add_timing_signal_1d(x)])
+    self.assertAllClose(res_nd, res_1d, atol=1e-5)
+
+  @parameterized.parameters(
+      {"max_backward": -1, "max_forward": 0},
+      {"max_backward": 2, "max_forward": 1},
+      {"max_backward": 0, "max_forward": -1},
+  )
+  @test_utils.run_in_graph_and_eager_modes()
+  def testAttentionBiasLocalStatic(self, max_backward, max_forward):
+    length = 6
+    static = common_attention.attention_bias_local(
+        length, max_backward, max_forward)
+    dynamic = common_attention.attention_bias_local(
+        tf.constant(length), max_backward, max_forward)
+    static_res, dynamic_res = self.evaluate([static, dynamic])
+    self.assertEqual(static_res.shape, (1, 1, length, length))
+    self.assertAllClose(static_res, dynamic_res)
+
+  @test_utils.run_in_graph_and_eager_modes()
+  def testAttentionBiasProximalStatic(self):
+    length = 5
+    static = common_attention.attention_bias_proximal(length)
+    dynamic = common_attention.attention_bias_proximal(tf.constant(length))
+    static_res, dynamic_res = self.evaluate([static, dynamic])
+    self.assertEqual(static_res.shape, (1, 1, length, length))
+    self.assertAllClose(static_res, dynamic_res)
+
+  @test_utils.run_in_graph_and_eager_modes()
+  def testAttentionBiasPrependInputsFullAttention(self):
+    padding = np.array([[0, 0, 1, 0, 0, 1],
+                        [0, 1, 0, 0, 1, 1]], dtype=np.float32)
+    bias = common_attention.attention_bias_prepend_inputs_full_attention(
+        tf.constant(padding))
+    res = self.evaluate(bias)
+    in_target = np.cumsum(padding, axis=1) - padding
+    target_pos = np.cumsum(in_target, axis=1)
+    expected = np.greater(
+        np.expand_dims(target_pos, 1), np.expand_dims(target_pos, 2))
+    self.assertAllClose(res, np.expand_dims(expected, 1) * -1e9)
+
   @test_utils.run_in_graph_and_eager_modes()
   def testHardenAttentionWeights(self):
     x = np.random.rand(5, 3, 12)
@@ -77,6 +153,15 @@ class CommonAttentionTest(parameterized.TestCase, tf.test.TestCase):
     res = self.evaluate(y)
     self.assertEqual(res.shape, input_shape)
 
+  @test_utils.run_in_graph_and_eager_modes()
+  def testEmbeddingToPadding(self):
+    emb = np.array([[[0., 0.], [1., -1.], [0., 1e-30]],
+                    [[0., -0.], [0., 0.], [2., 0.]]])
+    padding = common_attention.embedding_to_padding(
+        tf.constant(emb, dtype=tf.float32))
+    res = self.evaluate(padding)
+    self.assertAllEqual(res, [[1., 0., 0.], [1., 1., 0.]])
+
   @test_utils.run_in_graph_and_eager_modes()
   def testDotProductAttention(self):
     x = np.random.rand(5, 7, 12, 32)
@@ -94,6 +179,7 @@ class CommonAttentionTest(parameterized.TestCase, tf.test.TestCase):
       ("batches", 4, 3, 8, 4, 1, 2),
       ("depth_v", 1, 1, 8, 4, 3, 2),
       ("block_length", 1, 1, 8, 4, 1, 4),
+      ("padded_length", 1, 1, 7, 4, 1, 4),
   )
   def testMaskedWithinBlockLocalAttention1D(self, batch, heads, length,
                                             depth_k, depth_v, block_length):
@@ -275,6 +361,23 @@ class CommonAttentionTest(parameterized.TestCase, tf.test.TestCase):
     res = self.evaluate(scattered_x)
     self.assertAllClose(x, res)
 
+  @test_utils.run_in_graph_and_eager_modes()
+  def test2dGatherAndScatterByReshape(self):
+    """Reshape-based 2d blocking matches the gather-based one."""
+    x_shape = [2, 2, 4, 6, 8]
+    query_shape = (2, 3)
+    x = tf.constant(np.random.rand(*x_shape), dtype=tf.float32)
+    x_indices = common_attention.gather_indices_2d(
+        x, query_shape, query_shape)
+    gathered_x = common_attention.gather_blocks_2d(x, x_indices)
+    reshaped_x = common_attention._gather_blocks_2d_by_reshape(x, query_shape)
+    restored_x = common_attention._scatter_blocks_2d_by_reshape(
+        reshaped_x, x_shape, query_shape)
+    x, gathered_x, reshaped_x, restored_x = self.evaluate(
+        [x, gathered_x, reshaped_x, restored_x])
+    self.assertAllEqual(gathered_x, reshaped_x)
+    self.assertAllEqual(x, restored_x)
+
   @test_utils.run_in_graph_and_eager_modes()
   def test2dBlockRasterScanMask(self):
     """Testing the 2d block raster scan mask."""
@@ -479,6 +582,21 @@ class CommonAttentionTest(parameterized.TestCase, tf.test.TestCase):
     x_indices, gathered_x = self.evaluate([x_indices, gathered_x])
     self.assertAllClose(correct_gathered_x, gathered_x)
 
+  @parameterized.parameters(
+      {"length_q": 5, "length_k": 5, "cache": False},
+      {"length_q": 3, "length_k": 7, "cache": False},
+      {"length_q": 1, "length_k": 6, "cache": True},
+  )
+  @test_utils.run_in_graph_and_eager_modes()
+  def testGenerateRelativePositionsMatrixStatic(self, length_q, length_k,
+                                                cache):
+    static = common_attention._generate_relative_positions_matrix(
+        length_q, length_k, 2, cache=cache)
+    dynamic = common_attention._generate_relative_positions_matrix(
+        tf.constant(length_q), tf.constant(length_k), 2, cache=cache)
+    static_res, dynamic_res = self.evaluate([static, dynamic])
+    self.assertAllEqual(static_res, dynamic_res)
+
   @test_utils.run_in_graph_and_eager_modes()
   def testDotProductAttentionRelative(self):
     x = np.random.rand(5, 7, 12, 32)
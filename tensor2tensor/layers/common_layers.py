@@ -2997,6 +2997,29 @@ def sample_with_temperature(logits, temperature, sampling_keep_top_k=-1):
     return choices
 
 
+def ones_matrix_band_part_numpy(rows, cols, num_lower, num_upper):
+  """NumPy version of ones_matrix_band_part for Python int arguments.
+
+  Args:
+    rows: int determining number of rows in output
+    cols: int
+    num_lower: int, maximum distance backward. Negative values indicate
+      unlimited.
+    num_upper: int, maximum distance forward. Negative values indicate
+      unlimited.
+
+  Returns:
+    float64 numpy array of shape [rows, cols].
+  """
+  if num_lower < 0:
+    num_lower = rows - 1
+  if num_upper < 0:
+    num_upper = cols - 1
+  lower_mask = np.tri(cols, rows, num_lower).T
+  upper_mask = np.tri(rows, cols, num_upper)
+  return lower_mask * upper_mask
+
+
 def ones_matrix_band_part(rows, cols, num_lower, num_upper, out_shape=None):
   """Matrix band part of ones.
 
@@ -3014,13 +3037,7 @@ def ones_matrix_band_part(rows, cols, num_lower, num_upper, out_shape=None):
   """
   if all([isinstance(el, int) for el in [rows, cols, num_lower, num_upper]]):
     # Needed info is constant, so we construct in numpy
-    if num_lower < 0:
-      num_lower = rows - 1
-    if num_upper < 0:
-      num_upper = cols - 1
-    lower_mask = np.tri(cols, rows, num_lower).T
-    upper_mask = np.tri(rows, cols, num_upper)
-    band = np.ones((rows, cols)) * lower_mask * upper_mask
+    band = ones_matrix_band_part_numpy(rows, cols, num_lower, num_upper)
     if out_shape:
       band = band.reshape(out_shape)
     band = tf.constant(band, tf.float32)
@@ -50,6 +50,19 @@ class CommonLayersTest(parameterized.TestCase, tf.test.TestCase):
     res = self.evaluate(y)
     self.assertAllClose(res, [0.0, 0.0, 0.5, 1.0, 1.0])
 
+  @parameterized.parameters(
+      {"num_lower": -1, "num_upper": 0},
+      {"num_lower": 2, "num_upper": 1},
+      {"num_lower": 0, "num_upper": -1},
+  )
+  @test_utils.run_in_graph_and_eager_modes()
+  def testOnesMatrixBandPartNumpy(self, num_lower, num_upper):
+    rows, cols = 4, 6
+    band = common_layers.ones_matrix_band_part_numpy(
+        rows, cols, num_lower, num_upper)
+    expected = tf.matrix_band_part(tf.ones([rows, cols]), num_lower, num_upper)
+    self.assertAllEqual(band, self.evaluate(expected))
+
   @test_utils.run_in_graph_and_eager_modes()
   def testFlatten4D3D(self):
     x = np.random.randint(1, high=9, size=(3, 5, 2))
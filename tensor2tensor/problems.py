@@ -30,4 +30,13 @@ def available():
   return registry.list_base_problems()
 
 
-all_problems.import_modules(all_problems.ALL_MODULES)
+def _import_all_problems():
+  all_problems.import_modules(all_problems.ALL_MODULES)
+
+
+# Problem modules register themselves on import, which is slow, so only import
+# them once a problem or env problem is actually looked up. Modules that define
+# flags are still imported now, so that their flags exist when argv is parsed.
+all_problems.import_modules(all_problems.FLAG_MODULES)
+registry.Registries.problems.set_loader(_import_all_problems)
+registry.Registries.env_problems.set_loader(_import_all_problems)
@@ -157,6 +157,8 @@ class Registry(object):
     self._validator = validator
     self._on_set = on_set
     self._value_transformer = value_transformer
+    self._loader = None
+    self._loading = False
 
   def default_key(self, value):
     """Default key used when key not provided. Uses function from __init__."""
@@ -166,6 +168,39 @@ class Registry(object):
   def name(self):
     return self._name
 
+  def set_loader(self, loader):
+    """Sets a callback that populates the registry on first lookup.
+
+    `loader` is called with no arguments right before the first membership
+    test, lookup or iteration, and is dropped once it returns. If it raises, the
+    error propagates and the loader runs again on the next access, so a failed
+    load never looks like a missing key. It is typically used to defer
+    importing the modules whose import registers the values.
+
+    Args:
+      loader: callable taking no arguments, or `None` to unset.
+    """
+    self._loader = loader
+
+  def _maybe_load(self):
+    """Runs the loader, if any, and drops it once it succeeds.
+
+    Raises:
+      RuntimeError: if the loader raises a KeyError, e.g. on a duplicate
+        registration. Lookups report missing keys with KeyError, so callers
+        catching it must not mistake a failed load for a missing key.
+    """
+    if self._loader is None or self._loading:
+      return
+    self._loading = True
+    try:
+      self._loader()
+    except KeyError as e:
+      raise RuntimeError("Loading registry %s failed: %s" % (self._name, e))
+    finally:
+      self._loading = False
+    self._loader = None
+
   def validate(self, key, value):
     """Validation function run before setting. Uses function from __init__."""
     if self._validator is not None:
@@ -189,7 +224,7 @@ class Registry(object):
     """
     if key is None:
       key = self.default_key(value)
-    if key in self:
+    if key in self._registry:
       raise KeyError(
           "key %s already registered in registry %s" % (key, self._name))
     if not callable(value):
@@ -256,9 +291,11 @@ class Registry(object):
     return self._value_transformer(key, value)
 
   def __contains__(self, key):
+    self._maybe_load()
     return key in self._registry
 
   def keys(self):
+    self._maybe_load()
     return self._registry.keys()
 
   def values(self):
@@ -268,9 +305,11 @@ class Registry(object):
     return ((k, self[k]) for k in self)  # complicated because of transformer
 
   def __iter__(self):
+    self._maybe_load()
     return iter(self._registry)
 
   def __len__(self):
+    self._maybe_load()
     return len(self._registry)
 
   def _clear(self):
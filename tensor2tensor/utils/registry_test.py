@@ -89,6 +89,50 @@ class RegistryClassTest(tf.test.TestCase):
     self.assertIsNone(r.get("b"))
     self.assertEqual(r.get("b", 3), 3)
 
+  def testLoader(self):
+    r = registry.Registry("test_registry")
+    calls = []
+
+    def loader():
+      calls.append(None)
+      r["loaded"] = lambda: 3
+
+    r.set_loader(loader)
+    r["a"] = lambda: None
+    self.assertEqual(calls, [])
+    self.assertEqual(r["loaded"](), 3)
+    self.assertEqual(sorted(r), ["a", "loaded"])
+    self.assertEqual(len(calls), 1)
+
+  def testLoaderFailureIsRaisedOnEveryAccess(self):
+    r = registry.Registry("test_registry")
+    calls = []
+
+    def loader():
+      calls.append(None)
+      if len(calls) < 3:
+        raise ImportError("broken module")
+      r["loaded"] = lambda: 3
+
+    r.set_loader(loader)
+    with self.assertRaises(ImportError):
+      r["loaded"]  # pylint: disable=pointless-statement
+    with self.assertRaises(ImportError):
+      "loaded" in r  # pylint: disable=pointless-statement
+    self.assertEqual(r["loaded"](), 3)
+    self.assertEqual(len(calls), 3)
+
+  def testLoaderKeyErrorIsNotAMissingKey(self):
+    r = registry.Registry("test_registry")
+    r["a"] = lambda: None
+
+    def loader():
+      r["a"] = lambda: None
+
+    r.set_loader(loader)
+    with self.assertRaisesRegexp(RuntimeError, "already registered"):
+      r["a"]  # pylint: disable=pointless-statement
+
 
 class EnvProblemRegistryTest(tf.test.TestCase):
 